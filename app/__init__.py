@@ -3,45 +3,194 @@ ESTOP Function Record System - Main Flask Application
 Mobile-friendly Flask web app for safety device testing
 """
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+from functools import wraps
 import logging
+import logging.handlers
 import os
-import json
+import queue
+import time
 from datetime import datetime
+from types import SimpleNamespace
 from .utils.auth import AuthManager
-from .models.database import ESTOPDatabase
+from .utils.cache import CacheManager
+from .models.database import db
 
-# Configure logging
+# Optional Redis-backed server-side sessions (Flask-Session)
+try:
+    import redis
+    from flask_session import Session
+    SESSION_BACKEND_AVAILABLE = True
+except ImportError:
+    SESSION_BACKEND_AVAILABLE = False
+
+# Optional orjson-backed JSON encoding - orjson encodes in native code and
+# is several times faster than the stdlib json used by Flask's default
+# provider, which matters for large device lists from /api/devices
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """Flask JSON provider that routes jsonify through orjson"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Configure logging - log records are handed to a background listener thread
+# via a queue so request threads never block on disk writes. The log
+# directory is untracked, so make sure it exists before opening the file.
+os.makedirs('logs', exist_ok=True)
+_log_queue = queue.Queue(-1)
+_file_handler = logging.FileHandler('logs/app.log')
+_file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
 logging.basicConfig(
-    filename='logs/app.log', 
     level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s: %(message)s'
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
+_log_listener = logging.handlers.QueueListener(_log_queue, _file_handler)
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
+# Role sets for privilege checks - built once so route handlers do a single
+# C-level set operation instead of rebuilding a list per request
+_ADMIN_ROLES = frozenset(('admin',))
+_EDITOR_ROLES = frozenset(('supervisor', 'admin'))
+
 def create_app():
     app = Flask(__name__)
     app.secret_key = 'estop_system_secret_key_2023'
-    
-    # Initialize components
+
+    if ORJSON_AVAILABLE:
+        app.json = OrjsonProvider(app)
+
+    @app.template_filter('datetimeformat')
+    def datetimeformat(ts):
+        """Render a stored timestamp for display.
+
+        Records store cheap Unix timestamps (time.time()); formatting only
+        happens here when a page is rendered. Legacy string values and
+        datetime objects pass through unchanged.
+        """
+        if ts is None or ts == '':
+            return 'N/A'
+        if isinstance(ts, (int, float)):
+            ts = datetime.fromtimestamp(ts)
+        if isinstance(ts, datetime):
+            return ts.isoformat(sep=' ', timespec='seconds')
+        return ts
+
+    # Use server-side sessions in Redis when available - the cookie then only
+    # carries an opaque session id instead of the full signed payload.
+    # Falls back to Flask's default cookie sessions if Redis is not running.
+    if SESSION_BACKEND_AVAILABLE and os.path.exists('/var/run/redis/redis.sock'):
+        try:
+            session_redis = redis.Redis(unix_socket_path='/var/run/redis/redis.sock',
+                                        socket_connect_timeout=1, socket_timeout=1)
+            session_redis.ping()
+            app.config.update(
+                SESSION_TYPE='redis',
+                SESSION_REDIS=session_redis,
+                SESSION_PERMANENT=False,
+                PERMANENT_SESSION_LIFETIME=3600
+            )
+            Session(app)
+            logger.info("Redis server-side session store enabled")
+        except Exception as e:
+            logger.warning("Redis session store unavailable, using cookie sessions: %s", e)
+
+
+    # Constant rejection responses for the JSON API routes - serialized once
+    # here so unauthenticated hits skip the per-request dict allocation,
+    # JSON encoding and Response construction
+    _unauthenticated_401 = app.response_class(
+        b'{"error": "Not authenticated"}', status=401, mimetype='application/json')
+    _unauthenticated_json = app.response_class(
+        b'{"success": false, "message": "Not authenticated"}',
+        mimetype='application/json')
+    _access_denied_json = app.response_class(
+        b'{"success": false, "message": "Access denied. Admin privileges required."}',
+        mimetype='application/json')
+
+    def require_auth(roles=None, denied_flash=None, denied_endpoint='index',
+                     unauth_response=None, denied_response=None):
+        """Decorator handling the session and privilege checks for a route.
+
+        Reads the session once per request: unauthenticated page requests
+        redirect to login (API routes return the prebuilt JSON response),
+        and a roles frozenset can gate the route, flashing denied_flash and
+        redirecting to denied_endpoint (or returning denied_response for
+        API routes) when the user lacks every required role.
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if 'username' not in session:
+                    return unauth_response or redirect(url_for('login'))
+                if roles is not None and roles.isdisjoint(session.get('privileges', ())):
+                    if denied_response is not None:
+                        return denied_response
+                    flash(*denied_flash)
+                    return redirect(url_for(denied_endpoint))
+                return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # Initialize components - db is the module-level singleton so repeated
+    # create_app calls share one connection pool
     auth_manager = AuthManager()
-    db = ESTOPDatabase()
-    
+    cache = CacheManager()
+
+    # Machines and the user list change rarely - cache them with a short TTL
+    # so page loads don't hit the database/users file every request
+    @cache.cached('machines', ttl=60)
+    def get_machines_cached():
+        return db.get_machines()
+
+    @cache.cached('users_all', ttl=60)
+    def get_all_users_cached():
+        return auth_manager.get_all_users()
+
+    # Memoize history queries per filter combination so repeated requests
+    # with the same search/filter/sort don't re-run the SQL query.
+    # Cleared whenever a new test is recorded.
+    _history_cache = {}  # (search, machine, user, sort) -> (expires_at, tests)
+    _HISTORY_TTL = 30
+    _HISTORY_CACHE_MAX = 256
+
+    def get_device_tests_cached(search_query, machine_filter, user_filter, sort_by):
+        cache_key = (search_query, machine_filter, user_filter, sort_by)
+        entry = _history_cache.get(cache_key)
+        if entry is not None and time.monotonic() < entry[0]:
+            return entry[1]
+
+        tests = db.get_device_tests(search_query, machine_filter, user_filter, sort_by)
+        if len(_history_cache) >= _HISTORY_CACHE_MAX:
+            _history_cache.clear()
+        _history_cache[cache_key] = (time.monotonic() + _HISTORY_TTL, tests)
+        return tests
+
+
     try:
         # Initialize database tables and sample data
         db.create_tables()
         db.insert_sample_data()
         logger.info("Database initialized successfully")
     except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
+        logger.error("Database initialization failed: %s", e)
     
     @app.route('/')
+    @require_auth()
     def index():
         """Main page - redirect to login if not authenticated"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        logger.info(f"User {session['username']} accessed main page")
-        machines = db.get_machines()
+        logger.info("User %s accessed main page", session['username'])
+        machines = get_machines_cached()
         return render_template('index.html', machines=machines, username=session['username'])
     
     @app.route('/login', methods=['GET', 'POST'])
@@ -54,11 +203,11 @@ def create_app():
             if auth_manager.authenticate(username, password):
                 session['username'] = username
                 session['privileges'] = auth_manager.get_user_privileges(username)
-                logger.info(f"User {username} logged in successfully")
+                logger.info("User %s logged in successfully", username)
                 return redirect(url_for('index'))
             else:
                 flash('Invalid username or password')
-                logger.warning(f"Failed login attempt for {username}")
+                logger.warning("Failed login attempt for %s", username)
         
         return render_template('login.html')
     
@@ -67,26 +216,22 @@ def create_app():
         """Logout user"""
         username = session.get('username', 'Unknown')
         session.clear()
-        logger.info(f"User {username} logged out")
+        logger.info("User %s logged out", username)
         flash('You have been logged out')
         return redirect(url_for('login'))
     
     @app.route('/api/devices/<int:machine_id>')
+    @require_auth(unauth_response=_unauthenticated_401)
     def get_devices(machine_id):
         """API endpoint to get devices for a machine"""
-        if 'username' not in session:
-            return jsonify({'error': 'Not authenticated'}), 401
-        
         devices = db.get_safety_devices(machine_id)
-        logger.info(f"Retrieved {len(devices)} devices for machine {machine_id}")
+        logger.info("Retrieved %s devices for machine %s", len(devices), machine_id)
         return jsonify(devices)
     
     @app.route('/test', methods=['POST'])
+    @require_auth(unauth_response=_unauthenticated_401)
     def record_test():
         """Record a safety device test"""
-        if 'username' not in session:
-            return jsonify({'error': 'Not authenticated'}), 401
-        
         try:
             data = request.get_json()
             machine_id = data['machine_id']
@@ -98,40 +243,30 @@ def create_app():
             success = db.record_test(machine_id, device_id, username, test_result, notes)
             
             if success:
-                logger.info(f"Test recorded successfully by {username}")
+                _history_cache.clear()
+                logger.info("Test recorded successfully by %s", username)
                 return jsonify({'success': True, 'message': 'Test recorded successfully'})
             else:
                 return jsonify({'success': False, 'message': 'Failed to record test'}), 500
                 
         except Exception as e:
-            logger.error(f"Error recording test: {e}")
+            logger.error("Error recording test: %s", e)
             return jsonify({'success': False, 'message': str(e)}), 500
     
     @app.route('/history')
+    @require_auth()
     def history():
         """View test history with search and filters"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
         search_query = request.args.get('search', '')
         machine_filter = request.args.get('machine', '')
         user_filter = request.args.get('user', '')
         sort_by = request.args.get('sort', 'date')
         
-        tests = db.get_device_tests(search_query, machine_filter, user_filter)
-        machines = db.get_machines()
-        users = auth_manager.get_all_users()
-        
-        # Sort tests
-        if sort_by == 'age':
-            tests = sorted(tests, key=lambda x: x['days_since_test'], reverse=True)
-        elif sort_by == 'machine':
-            tests = sorted(tests, key=lambda x: x['machine_name'])
-        elif sort_by == 'device':
-            tests = sorted(tests, key=lambda x: x['device_name'])
-        # Default sort by date (newest first)
-        
-        logger.info(f"User {session['username']} viewed history page with {len(tests)} results")
+        tests = get_device_tests_cached(search_query, machine_filter, user_filter, sort_by)
+        machines = get_machines_cached()
+        users = get_all_users_cached()
+
+        logger.info("User %s viewed history page with %s results", session['username'], len(tests))
         
         return render_template('history.html', 
                              tests=tests, 
@@ -144,23 +279,11 @@ def create_app():
                              username=session['username'])
     
     @app.route('/debug')
+    @require_auth()
     def debug():
         """Debug endpoint showing all available routes"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        logger.info(f"User {session['username']} accessed debug endpoint")
-        endpoints = []
-        
-        for rule in app.url_map.iter_rules():
-            methods = ', '.join(rule.methods - {'HEAD', 'OPTIONS'})
-            endpoints.append({
-                'endpoint': rule.rule,
-                'methods': methods,
-                'function': rule.endpoint
-            })
-        
-        return render_template('debug.html', endpoints=endpoints, username=session['username'])
+        logger.info("User %s accessed debug endpoint", session['username'])
+        return render_template('debug.html', endpoints=_endpoints_cache, username=session['username'])
     
     @app.errorhandler(404)
     def not_found(error):
@@ -168,38 +291,25 @@ def create_app():
     
     @app.errorhandler(500)
     def internal_error(error):
-        logger.error(f"Internal server error: {error}")
+        logger.error("Internal server error: %s", error)
         return render_template('500.html'), 500
     
     # User Administration Routes
     @app.route('/user_admin')
+    @require_auth(roles=_ADMIN_ROLES,
+                  denied_flash=('Access denied. Admin privileges required.',))
     def user_admin():
         """User administration page - only for admins"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        # Check if user has admin privileges
-        user_privileges = session.get('privileges', [])
-        if 'admin' not in user_privileges:
-            flash('Access denied. Admin privileges required.')
-            return redirect(url_for('index'))
-        
-        logger.info(f"Admin {session['username']} accessed user administration")
+        logger.info("Admin %s accessed user administration", session['username'])
         users = auth_manager.users
         return render_template('user_admin.html', users=users, username=session['username'])
     
     @app.route('/add_user', methods=['POST'])
+    @require_auth(roles=_ADMIN_ROLES,
+                  denied_flash=('Access denied. Admin privileges required.',),
+                  denied_endpoint='user_admin')
     def add_user():
         """Add a new user - capitalize first and last names"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        # Check admin privileges
-        user_privileges = session.get('privileges', [])
-        if 'admin' not in user_privileges:
-            flash('Access denied. Admin privileges required.')
-            return redirect(url_for('user_admin'))
-        
         try:
             first_name = request.form.get('first_name', '').strip()
             last_name = request.form.get('last_name', '').strip()
@@ -212,7 +322,7 @@ def create_app():
             first_name = first_name.capitalize() if first_name else ''
             last_name = last_name.capitalize() if last_name else ''
             
-            logger.info(f"Admin {session['username']} adding new user: {first_name} {last_name}")
+            logger.info("Admin %s adding new user: %s %s", session['username'], first_name, last_name)
             
             # Check if username already exists
             if username in auth_manager.users:
@@ -227,38 +337,35 @@ def create_app():
                 'password': password,
                 'role': role,
                 'privileges': [role] if role in ['admin', 'supervisor'] else ['user'],
-                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                # Store a raw Unix timestamp - formatting is deferred to the
+                # datetimeformat template filter at render time
+                'created_at': time.time()
             }
             
             auth_manager.users[username] = new_user
             
             # Save users to file
             try:
-                users_file = '/home/eraser/PycharmProjects/RACE/users.json'
-                with open(users_file, 'w') as f:
-                    json.dump(auth_manager.users, f, indent=2)
-                logger.info(f"Successfully added user: {first_name} {last_name} ({username})")
+                auth_manager.save_users()
+                cache.delete('users_all')
+                logger.info("Successfully added user: %s %s (%s)", first_name, last_name, username)
                 flash(f'User {first_name} {last_name} added successfully!', 'success')
             except Exception as e:
-                logger.error(f"Error saving users file: {e}")
+                logger.error("Error saving users file: %s", e)
                 flash('User added but could not save to file.', 'warning')
             
         except Exception as e:
-            logger.error(f"Error adding user: {str(e)}")
+            logger.error("Error adding user: %s", e)
             flash('Error adding user. Please try again.', 'error')
         
         return redirect(url_for('user_admin'))
     
     @app.route('/delete_user/<username>', methods=['DELETE'])
+    @require_auth(roles=_ADMIN_ROLES,
+                  unauth_response=_unauthenticated_json,
+                  denied_response=_access_denied_json)
     def delete_user(username):
         """Delete a user - only for admins"""
-        if 'username' not in session:
-            return jsonify({'success': False, 'message': 'Not authenticated'})
-        
-        user_privileges = session.get('privileges', [])
-        if 'admin' not in user_privileges:
-            return jsonify({'success': False, 'message': 'Access denied. Admin privileges required.'})
-        
         try:
             # Don't allow deletion of the current user
             if username == session['username']:
@@ -275,34 +382,31 @@ def create_app():
             
             # Save users to file
             try:
-                users_file = '/home/eraser/PycharmProjects/RACE/users.json'
-                with open(users_file, 'w') as f:
-                    json.dump(auth_manager.users, f, indent=2)
-                
-                logger.info(f"Admin {session['username']} deleted user: {username}")
+                auth_manager.save_users()
+                cache.delete('users_all')
+                logger.info("Admin %s deleted user: %s", session['username'], username)
                 return jsonify({'success': True, 'message': 'User deleted successfully.'})
             except Exception as e:
-                logger.error(f"Error saving users file after deletion: {e}")
+                logger.error("Error saving users file after deletion: %s", e)
                 return jsonify({'success': False, 'message': 'Error saving changes.'})
             
         except Exception as e:
-            logger.error(f"Error deleting user {username}: {str(e)}")
+            logger.error("Error deleting user %s: %s", username, e)
             return jsonify({'success': False, 'message': 'Error deleting user.'})
     
     # Mock Reports System (since no database tables exist yet)
-    _mock_reports = []
+    # Keyed by report id so lookups are O(1); dict preserves insertion order
+    _mock_reports_by_id = {}
     _report_id_counter = 1
     
     @app.route('/reports')
+    @require_auth()
     def reports():
         """View all reports"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        logger.info(f"User {session['username']} accessed reports page")
+        logger.info("User %s accessed reports page", session['username'])
         
         # For demo purposes, use mock data
-        filtered_reports = _mock_reports.copy()
+        filtered_reports = list(_mock_reports_by_id.values())
         
         # Apply filters if provided
         status_filter = request.args.get('status')
@@ -317,27 +421,22 @@ def create_app():
         
         return render_template('reports.html', 
                              reports=filtered_reports,
-                             current_user=type('obj', (object,), {
-                                 'role': session.get('privileges', ['user'])[0]
-                             })(),
+                             current_user=SimpleNamespace(
+                                 role=session.get('privileges', ['user'])[0]
+                             ),
                              username=session['username'])
     
     @app.route('/edit_report/<int:report_id>')
+    @require_auth(roles=_EDITOR_ROLES,
+                  denied_flash=('Access denied. Only supervisors and admins can edit reports.', 'error'),
+                  denied_endpoint='reports')
     def edit_report(report_id):
         """Edit an existing report or create new - only for supervisors and admins"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        user_privileges = session.get('privileges', [])
-        if not any(priv in ['supervisor', 'admin'] for priv in user_privileges):
-            flash('Access denied. Only supervisors and admins can edit reports.', 'error')
-            return redirect(url_for('reports'))
-        
-        logger.info(f"User {session['username']} accessing edit report {report_id}")
+        logger.info("User %s accessing edit report %s", session['username'], report_id)
         
         report = None
         if report_id > 0:
-            report = next((r for r in _mock_reports if r.get('id') == report_id), None)
+            report = _mock_reports_by_id.get(report_id)
             if not report:
                 flash('Report not found.', 'error')
                 return redirect(url_for('reports'))
@@ -349,17 +448,12 @@ def create_app():
                              username=session['username'])
     
     @app.route('/save_report', methods=['POST'])
+    @require_auth(roles=_EDITOR_ROLES,
+                  denied_flash=('Access denied. Only supervisors and admins can edit reports.', 'error'),
+                  denied_endpoint='reports')
     def save_report():
         """Save report changes - only for supervisors and admins"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        user_privileges = session.get('privileges', [])
-        if not any(priv in ['supervisor', 'admin'] for priv in user_privileges):
-            flash('Access denied. Only supervisors and admins can edit reports.', 'error')
-            return redirect(url_for('reports'))
-        
-        logger.info(f"User {session['username']} saving report changes")
+        logger.info("User %s saving report changes", session['username'])
         
         try:
             global _report_id_counter
@@ -377,8 +471,9 @@ def create_app():
             equipment_involved = request.form.get('equipment_involved')
             witnesses = request.form.get('witnesses')
             
+            now = datetime.now()
             report_data = {
-                'incident_date': datetime.fromisoformat(incident_date.replace('T', ' ')) if incident_date else None,
+                'incident_date': datetime.fromisoformat(incident_date) if incident_date else None,
                 'location': location,
                 'severity': severity,
                 'status': status,
@@ -389,92 +484,107 @@ def create_app():
                 'corrective_actions': corrective_actions,
                 'equipment_involved': equipment_involved,
                 'witnesses': witnesses,
-                'modified_at': datetime.now(),
+                'modified_at': now,
                 'modified_by': session['username']
             }
             
-            # Add reporter and assignee names for display
-            if reported_by and reported_by in auth_manager.users:
-                user_data = auth_manager.users[reported_by]
-                report_data['reporter_first'] = user_data.get('first_name', '')
-                report_data['reporter_last'] = user_data.get('last_name', '')
-            
-            if assigned_to and assigned_to in auth_manager.users:
-                user_data = auth_manager.users[assigned_to]
-                report_data['assignee_first'] = user_data.get('first_name', '')
-                report_data['assignee_last'] = user_data.get('last_name', '')
+            # Add reporter and assignee names for display - bind the users
+            # dict locally and use .get() so each name costs one hash lookup
+            users = auth_manager.users
+            reporter = users.get(reported_by) if reported_by else None
+            if reporter:
+                report_data['reporter_first'] = reporter.get('first_name', '')
+                report_data['reporter_last'] = reporter.get('last_name', '')
+
+            assignee = users.get(assigned_to) if assigned_to else None
+            if assignee:
+                report_data['assignee_first'] = assignee.get('first_name', '')
+                report_data['assignee_last'] = assignee.get('last_name', '')
             
             if report_id:  # Update existing report
                 report_id = int(report_id)
-                for i, report in enumerate(_mock_reports):
-                    if report.get('id') == report_id:
-                        report_data['id'] = report_id
-                        report_data['created_at'] = report.get('created_at')
-                        report_data['created_by'] = report.get('created_by')
-                        _mock_reports[i] = report_data
-                        break
-                
-                logger.info(f"Updated report {report_id} by user {session['username']}")
+                existing = _mock_reports_by_id.get(report_id)
+                if existing:
+                    report_data['id'] = report_id
+                    report_data['created_at'] = existing.get('created_at')
+                    report_data['created_by'] = existing.get('created_by')
+                    _mock_reports_by_id[report_id] = report_data
+
+                logger.info("Updated report %s by user %s", report_id, session['username'])
                 flash('Report updated successfully!', 'success')
                 
             else:  # Create new report
                 report_data['id'] = _report_id_counter
-                report_data['created_at'] = datetime.now()
+                report_data['created_at'] = now
                 report_data['created_by'] = session['username']
-                _mock_reports.append(report_data)
+                _mock_reports_by_id[_report_id_counter] = report_data
                 _report_id_counter += 1
                 
-                logger.info(f"Created new report by user {session['username']}")
+                logger.info("Created new report by user %s", session['username'])
                 flash('Report created successfully!', 'success')
             
             return redirect(url_for('reports'))
             
         except Exception as e:
-            logger.error(f"Error saving report: {str(e)}")
+            logger.error("Error saving report: %s", e)
             flash('Error saving report. Please try again.', 'error')
             return redirect(url_for('reports'))
     
     @app.route('/view_report/<int:report_id>')
+    @require_auth()
     def view_report(report_id):
         """View a specific report"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        report = next((r for r in _mock_reports if r.get('id') == report_id), None)
+        report = _mock_reports_by_id.get(report_id)
         if not report:
             flash('Report not found.', 'error')
             return redirect(url_for('reports'))
         
-        logger.info(f"User {session['username']} viewing report {report_id}")
+        logger.info("User %s viewing report %s", session['username'], report_id)
         return render_template('view_report.html', 
                              report=report,
                              username=session['username'])
     
     @app.route('/report_summary')
+    @require_auth()
     def report_summary():
         """View report summary statistics"""
-        if 'username' not in session:
-            return redirect(url_for('login'))
-        
-        logger.info(f"User {session['username']} accessed report summary")
-        
-        # Calculate summary statistics
-        total_reports = len(_mock_reports)
-        open_reports = len([r for r in _mock_reports if r.get('status') == 'open'])
-        critical_reports = len([r for r in _mock_reports if r.get('severity') == 'critical'])
-        
+        logger.info("User %s accessed report summary", session['username'])
+        
+        # Calculate summary statistics in a single pass over the reports
+        all_reports = list(_mock_reports_by_id.values())
+        open_reports = critical_reports = resolved_reports = 0
+        for r in all_reports:
+            status = r.get('status')
+            if status == 'open':
+                open_reports += 1
+            elif status == 'resolved':
+                resolved_reports += 1
+            if r.get('severity') == 'critical':
+                critical_reports += 1
+
         summary = {
-            'total': total_reports,
+            'total': len(all_reports),
             'open': open_reports,
             'critical': critical_reports,
-            'resolved': len([r for r in _mock_reports if r.get('status') == 'resolved'])
+            'resolved': resolved_reports
         }
-        
+
         return render_template('report_summary.html',
                              summary=summary,
-                             reports=_mock_reports,
+                             reports=all_reports,
                              username=session['username'])
     
+    # The route table is fixed once all views above are registered, so build
+    # the /debug endpoint listing once here instead of on every request
+    _endpoints_cache = [
+        {
+            'endpoint': rule.rule,
+            'methods': ', '.join(rule.methods - {'HEAD', 'OPTIONS'}),
+            'function': rule.endpoint
+        }
+        for rule in app.url_map.iter_rules()
+    ]
+
     return app
 
 if __name__ == '__main__':
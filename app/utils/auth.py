@@ -2,12 +2,41 @@
 Authentication utility for ESTOP System
 Loads users from RACE/users.json and handles authentication
 """
+import hashlib
+import hmac
 import json
 import os
 import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Single source of truth for the users file location, overridable via the
+# environment so CI and other machines aren't tied to the deployment path
+USERS_FILE = os.environ.get('ESTOP_USERS_JSON',
+                            '/home/eraser/PycharmProjects/RACE/users.json')
+
+# Serializes writers so two concurrent admin saves can't interleave
+_users_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _read_users_file():
+    """Read and parse the users file once per process.
+
+    Every AuthManager shares the returned dict, so constructing a new
+    manager (e.g. per create_app call) no longer re-reads the disk.
+    """
+    try:
+        users = json.loads(Path(USERS_FILE).read_bytes())
+        logger.info(f"Loaded {len(users)} users from {USERS_FILE}")
+        return users
+    except Exception as e:
+        logger.error(f"Error loading users: {e}")
+        return {}
+
 class AuthManager:
     def __init__(self):
         self.users = {}
@@ -15,19 +44,57 @@ class AuthManager:
     
     def load_users(self):
         """Load users from RACE users.json file"""
-        try:
-            users_file = '/home/eraser/PycharmProjects/RACE/users.json'
-            with open(users_file, 'r') as f:
-                self.users = json.load(f)
-            logger.info(f"Loaded {len(self.users)} users from {users_file}")
-        except Exception as e:
-            logger.error(f"Error loading users: {e}")
-            self.users = {}
+        self.users = _read_users_file()
+        self._rebuild_password_hashes()
+
+    def _rebuild_password_hashes(self):
+        """Pre-hash the stored passwords so authenticate can do a
+        constant-time digest comparison instead of a plaintext ==.
+
+        Must be re-run whenever self.users is mutated - a stale digest
+        would let a deleted (or re-added with a new password) user keep
+        authenticating with the old password.
+        """
+        self._password_hashes = {
+            username: self._hash_password(data.get('password', ''))
+            for username, data in self.users.items()
+        }
+
+    @staticmethod
+    def _hash_password(password):
+        return hashlib.sha256(str(password).encode()).digest()
+
+    def _password_hash(self, username):
+        """Get the cached password hash, hashing lazily for users added at runtime"""
+        digest = self._password_hashes.get(username)
+        if digest is None and username in self.users:
+            digest = self._hash_password(self.users[username].get('password', ''))
+            self._password_hashes[username] = digest
+        return digest
     
+    def save_users(self):
+        """Persist the users dict back to the users.json file atomically"""
+        # The add/delete routes mutate self.users before calling this, so
+        # resync the digest cache here to drop deleted users' hashes and
+        # pick up new or changed passwords
+        self._rebuild_password_hashes()
+        # Write to a temp file and os.replace it into place - the rename is
+        # atomic on POSIX, so readers never see a half-written file even if
+        # the process dies mid-save
+        tmp_file = USERS_FILE + '.tmp'
+        with _users_lock:
+            # Compact separators - pretty-printing doubles the output size and
+            # the encoding cost on every admin mutation
+            with open(tmp_file, 'w') as f:
+                json.dump(self.users, f, separators=(',', ':'))
+            os.replace(tmp_file, USERS_FILE)
+        logger.info(f"Saved {len(self.users)} users to {USERS_FILE}")
+
     def authenticate(self, username, password):
         """Authenticate a user"""
         if username in self.users:
-            if self.users[username]['password'] == password:
+            expected = self._password_hash(username)
+            if expected is not None and hmac.compare_digest(self._hash_password(password), expected):
                 logger.info(f"Successful authentication for user: {username}")
                 return True
             else:
@@ -0,0 +1,88 @@
+"""
+Cache utility for ESTOP System
+Small TTL cache for slowly-changing lookups (machines, user lists).
+Uses Redis when available, otherwise falls back to an in-process dict.
+"""
+import json
+import logging
+import os
+import time
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class CacheManager:
+    """TTL key/value cache backed by Redis or a local dict"""
+
+    def __init__(self, redis_socket='/var/run/redis/redis.sock'):
+        self.redis = None
+        self._local = {}  # key -> (expires_at, value)
+
+        if REDIS_AVAILABLE and os.path.exists(redis_socket):
+            try:
+                client = redis.Redis(unix_socket_path=redis_socket,
+                                     socket_connect_timeout=1, socket_timeout=1)
+                client.ping()
+                self.redis = client
+                logger.info("Cache backed by Redis")
+            except Exception as e:
+                logger.warning(f"Redis cache unavailable, using in-process cache: {e}")
+
+    def get(self, key):
+        """Get a cached value, or None if missing/expired"""
+        try:
+            if self.redis is not None:
+                raw = self.redis.get(key)
+                return json.loads(raw) if raw is not None else None
+
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._local[key]
+                return None
+            return value
+        except Exception as e:
+            logger.error(f"Cache get failed for {key}: {e}")
+            return None
+
+    def set(self, key, value, ttl=60):
+        """Store a value with a TTL in seconds"""
+        try:
+            if self.redis is not None:
+                self.redis.setex(key, ttl, json.dumps(value))
+            else:
+                self._local[key] = (time.monotonic() + ttl, value)
+        except Exception as e:
+            logger.error(f"Cache set failed for {key}: {e}")
+
+    def delete(self, key):
+        """Invalidate a cached key"""
+        try:
+            if self.redis is not None:
+                self.redis.delete(key)
+            else:
+                self._local.pop(key, None)
+        except Exception as e:
+            logger.error(f"Cache delete failed for {key}: {e}")
+
+    def cached(self, key, ttl=60):
+        """Decorator that caches a zero-argument lookup under a fixed key"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper():
+                value = self.get(key)
+                if value is None:
+                    value = fn()
+                    self.set(key, value, ttl)
+                return value
+            return wrapper
+        return decorator
@@ -7,54 +7,68 @@ import pandas as pd
 import sys
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
 # Add the app directory to Python path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+APP_DIR = Path(__file__).resolve().parent / 'app'
+sys.path.insert(0, str(APP_DIR))
 
-from app.models.database import ESTOPDatabase
+from app.models.database import db
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Keywords used to classify worksheet columns as device name / device type
+NAME_KEYWORDS = ('name', 'device', 'description', 'item')
+TYPE_KEYWORDS = ('type', 'category', 'class')
+
+# Worksheets import concurrently; each import is mostly waiting on SQL
+# Server, so a few threads overlap the network round trips
+MAX_IMPORT_WORKERS = 4
+
+# Constant statement text for the batched device upsert - identical text on
+# every execution lets SQL Server reuse one cached plan across the import.
+# MERGE is atomic per row, unlike the old IF NOT EXISTS + INSERT pair.
+DEVICE_MERGE_SQL = """
+    MERGE safety_devices AS t
+    USING (VALUES (%s, %s, %s)) AS s(machine_id, device_name, device_type)
+    ON t.machine_id = s.machine_id AND t.device_name = s.device_name
+    WHEN NOT MATCHED THEN
+        INSERT (machine_id, device_name, device_type)
+        VALUES (s.machine_id, s.device_name, s.device_type);
+"""
+
 def analyze_excel_file(file_path):
     """Analyze the Excel file structure"""
     logger.info(f"Analyzing Excel file: {file_path}")
     
     try:
-        # Read the Excel file to get all worksheet names
-        xl_file = pd.ExcelFile(file_path)
-        worksheets = xl_file.sheet_names
-        
-        logger.info(f"Found {len(worksheets)} worksheets:")
-        for i, sheet in enumerate(worksheets):
+        # Parse the workbook once - sheet_name=None returns every worksheet
+        # as {name: DataFrame} instead of re-opening and re-parsing the
+        # XLSX container for each sheet
+        with pd.ExcelFile(file_path) as xl_file:
+            worksheet_data = pd.read_excel(xl_file, sheet_name=None)
+
+        logger.info(f"Found {len(worksheet_data)} worksheets:")
+        for i, sheet in enumerate(worksheet_data):
             logger.info(f"  {i+1}. {sheet}")
-        
-        # Analyze each worksheet
-        worksheet_data = {}
-        for sheet_name in worksheets:
+
+        # Log a structural summary of each worksheet
+        for sheet_name, df in worksheet_data.items():
             logger.info(f"\nAnalyzing worksheet: {sheet_name}")
-            
-            try:
-                # Read the worksheet
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                
-                logger.info(f"  Shape: {df.shape} (rows x columns)")
-                logger.info(f"  Columns: {list(df.columns)}")
-                
-                # Show first few rows
-                logger.info("  First few rows:")
-                logger.info(df.head().to_string())
-                
-                # Store the data
-                worksheet_data[sheet_name] = df
-                
-            except Exception as e:
-                logger.error(f"Error reading worksheet {sheet_name}: {e}")
-                
+            logger.info(f"  Shape: {df.shape} (rows x columns)")
+            logger.info(f"  Columns: {list(df.columns)}")
+
+            # Formatting sample rows costs a full to_string render per
+            # sheet - only pay for it when debug logging is actually on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("  First few rows:\n%s", df.head().to_string())
+
         return worksheet_data
-        
+
     except Exception as e:
         logger.error(f"Error analyzing Excel file: {e}")
         return {}
@@ -64,7 +78,6 @@ def create_database_tables():
     logger.info("Creating database tables...")
     
     try:
-        db = ESTOPDatabase()
         db.create_tables()
         logger.info("Database tables created successfully")
         return db
@@ -77,73 +90,59 @@ def import_machine_data(db, machine_name, device_data):
     logger.info(f"Importing data for machine: {machine_name}")
     
     try:
-        # Insert machine if it doesn't exist
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            IF NOT EXISTS (SELECT 1 FROM machines WHERE machine_name = %s)
-            INSERT INTO machines (machine_name, location) VALUES (%s, %s)
-        """, (machine_name, machine_name, f"Location for {machine_name}"))
-        
-        # Get machine ID
-        cursor.execute("SELECT machine_id FROM machines WHERE machine_name = %s", (machine_name,))
-        result = cursor.fetchone()
-        if not result:
-            raise Exception(f"Failed to get machine_id for {machine_name}")
-        
-        machine_id = result[0]
-        logger.info(f"Machine ID: {machine_id}")
-        
-        # Import devices
-        device_count = 0
-        for index, row in device_data.iterrows():
-            # Try to identify device name and type columns
-            device_name = None
-            device_type = None
-            
-            # Common column names to look for
-            for col in device_data.columns:
-                col_lower = str(col).lower()
-                
-                # Look for device name
-                if device_name is None and any(keyword in col_lower for keyword in ['name', 'device', 'description', 'item']):
-                    device_name = str(row[col]) if pd.notna(row[col]) else None
-                
-                # Look for device type
-                if device_type is None and any(keyword in col_lower for keyword in ['type', 'category', 'class']):
-                    device_type = str(row[col]) if pd.notna(row[col]) else None
-            
-            # If no specific columns found, use the first non-empty column as device name
-            if device_name is None:
-                for col in device_data.columns:
-                    if pd.notna(row[col]) and str(row[col]).strip():
-                        device_name = str(row[col])
-                        break
-            
-            # Set default type if not found
-            if device_type is None:
-                device_type = "Safety Device"
-            
-            # Skip empty rows
-            if device_name is None or not str(device_name).strip():
-                continue
-            
-            device_name = str(device_name).strip()
-            device_type = str(device_type).strip()
-            
-            # Insert device
+        # One transaction for the whole machine - the machine upsert and all
+        # its device rows commit together (and roll back together on error)
+        with db.import_connection() as conn:
+            cursor = conn.cursor()
+
             cursor.execute("""
-                IF NOT EXISTS (SELECT 1 FROM safety_devices WHERE device_name = %s AND machine_id = %s)
-                INSERT INTO safety_devices (machine_id, device_name, device_type) 
-                VALUES (%s, %s, %s)
-            """, (device_name, machine_id, machine_id, device_name, device_type))
-            
-            device_count += 1
-            logger.info(f"  Added device: {device_name} ({device_type})")
-        
-        conn.close()
-        logger.info(f"Imported {device_count} devices for machine {machine_name}")
+                MERGE machines AS t
+                USING (VALUES (%s, %s)) AS s(machine_name, location)
+                ON t.machine_name = s.machine_name
+                WHEN NOT MATCHED THEN
+                    INSERT (machine_name, location) VALUES (s.machine_name, s.location);
+            """, (machine_name, f"Location for {machine_name}"))
+
+            # Get machine ID
+            cursor.execute("SELECT machine_id FROM machines WHERE machine_name = %s", (machine_name,))
+            result = cursor.fetchone()
+            if not result:
+                raise Exception(f"Failed to get machine_id for {machine_name}")
+
+            machine_id = result['machine_id']
+            logger.info(f"Machine ID: {machine_id}")
+
+            # Import devices - classify the columns once, then build the rows
+            # with vectorized pandas operations instead of scanning every column
+            # per row with iterrows
+            columns = list(device_data.columns)
+            name_cols = [c for c in columns
+                         if any(keyword in str(c).lower() for keyword in NAME_KEYWORDS)]
+            type_cols = [c for c in columns
+                         if any(keyword in str(c).lower() for keyword in TYPE_KEYWORDS)]
+
+            # Device name: first populated keyword column, falling back to the
+            # first populated column of any kind (same order the row scan used)
+            name_source = name_cols + [c for c in columns if c not in name_cols]
+            names = device_data[name_source].bfill(axis=1).iloc[:, 0].astype(str).str.strip()
+
+            if type_cols:
+                types = device_data[type_cols].bfill(axis=1).iloc[:, 0]
+                types = types.fillna("Safety Device").astype(str).str.strip()
+            else:
+                types = pd.Series("Safety Device", index=device_data.index)
+
+            # Skip empty rows (all-NaN rows stringify to 'nan' after astype)
+            valid = names.ne('') & names.ne('nan')
+            device_rows = [
+                (machine_id, device_name, device_type)
+                for device_name, device_type in zip(names[valid], types[valid])
+            ]
+
+            if device_rows:
+                cursor.executemany(DEVICE_MERGE_SQL, device_rows)
+
+        logger.info(f"Imported {len(device_rows)} devices for machine {machine_name}")
         
     except Exception as e:
         logger.error(f"Error importing data for machine {machine_name}: {e}")
@@ -175,13 +174,22 @@ def main():
         # 2. Create database tables
         db = create_database_tables()
         
-        # 3. Import data for each worksheet (machine)
-        for machine_name, device_data in worksheet_data.items():
-            try:
-                import_machine_data(db, machine_name, device_data)
-            except Exception as e:
-                logger.error(f"Failed to import data for {machine_name}: {e}")
-                continue
+        # 3. Import data for each worksheet (machine). Sheets are
+        # independent and network-bound, so run them on a small thread
+        # pool - each worker uses its own transaction via
+        # db.import_connection, and pytds releases the GIL during
+        # socket I/O so the round trips actually overlap
+        workers = min(MAX_IMPORT_WORKERS, len(worksheet_data))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(import_machine_data, db, machine_name, device_data): machine_name
+                for machine_name, device_data in worksheet_data.items()
+            }
+            for future, machine_name in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Failed to import data for {machine_name}: {e}")
         
         logger.info("="*60)
         logger.info("Data import completed successfully!")
@@ -5,12 +5,13 @@ Basic tests to verify application functionality
 """
 import unittest
 import sys
-import os
 import signal
 import time
+from pathlib import Path
 
 # Add the app directory to Python path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+APP_DIR = Path(__file__).resolve().parent.parent / 'app'
+sys.path.insert(0, str(APP_DIR))
 
 # Set timeout for tests (60 seconds as per rules)
 def timeout_handler(signum, frame):
@@ -22,17 +23,25 @@ signal.alarm(60)
 class ESTOPSystemTests(unittest.TestCase):
     """Test cases for ESTOP System"""
     
-    def setUp(self):
-        """Set up test fixtures"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up shared test fixtures once for the whole class.
+
+        create_app is expensive (user loading, database setup), so build
+        one app and client and share them across all test methods.
+        """
         try:
             from app import create_app
-            self.app = create_app()
-            self.app.config['TESTING'] = True
-            self.client = self.app.test_client()
+            cls.app = create_app()
+            cls.app.config['TESTING'] = True
             print(f"Test setup complete: {time.strftime('%H:%M:%S')}")
         except Exception as e:
             print(f"Setup failed: {e}")
             raise
+
+    def setUp(self):
+        """Fresh client per test so session cookies don't leak between tests"""
+        self.client = self.app.test_client()
     
     def test_app_creation(self):
         """Test that the app can be created successfully"""